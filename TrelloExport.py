@@ -15,6 +15,10 @@
 
     create_spreadsheet_nested_list() creates a nested list, where each list of the parent list represents a row.
 
+    get_filtered_cards() fetches only the cards the export asks for. The card state (--include-closed) and the
+    lists (--lists) are passed to the Trello API, while --since, --until and --labels are applied to the cards
+    that come back. A filtered export only writes the spreadsheet, it is not emailed and the board is not updated.
+
     create_spreadsheet() creates a workbook and worksheet using the xlsxwriter module. It takes the nested list,
     and iterates through the lists, writing each cell to the worksheet.
 
@@ -29,6 +33,7 @@
 """
 
 
+import argparse
 import datetime
 import re
 import requests
@@ -48,10 +53,11 @@ AUTH = f'?key={API_KEY}&token={USER_TOKEN}'
 AUTH_AND = f'&key={API_KEY}&token={USER_TOKEN}'
 BOARD_ID = '****'
 BOARD_URL = 'https://trello.com/1/boards/'
-ALL_CARD_URL = f'{BOARD_URL}{BOARD_ID}/cards{AUTH}'
+ALL_CARD_URL = f'{BOARD_URL}{BOARD_ID}/cards'
 MEMBERS_URL = f'{BOARD_URL}{BOARD_ID}/members{AUTH}'
 LISTS_URL = f'{BOARD_URL}{BOARD_ID}/lists{AUTH}'
 CARD_URL = 'https://trello.com/1/cards/'
+LIST_URL = 'https://trello.com/1/lists/'
 CUSTOM_FIELDS_URL = f'{BOARD_URL}{BOARD_ID}/customFields{AUTH}'
 CUSTOM_FIELD_ITEMS_URL = '/customFieldItems'
 ACTIONS_URL = '/actions?filter=all'
@@ -61,6 +67,12 @@ TIMEZONE = 'US/Pacific'
 DATE_TIME_FORMAT_UTC = '%Y-%m-%d %H:%M:%S.%f'
 DATE_TIME_FORMAT_LOCAL = '%Y-%m-%d %H:%M'
 WEEKDAY_CHECK = 'Friday'
+DATE_ARG_FORMAT = '%Y-%m-%d'
+
+# Trello card filters
+CARD_FILTER_OPEN = 'open'
+CARD_FILTER_VISIBLE = 'visible'
+CARD_FILTER_ALL = 'all'
 
 SPREADSHEET_ROW_1 = ['MODIFIED DATE', 'TYPE', 'TITLE', 'STATUS', 'WORKED ON BY', 'BACKLOG DATE',
                      'APPROVED DATE', 'EST. # OF REVISIONS', 'COMPLETED DATE', 'INFO', 'NOTES', 'URL']
@@ -107,17 +119,177 @@ def get_date() -> list:
     return [today_date, next_workday_date]
 
 
-def get_all_cards() -> list:
+def get_export_parser() -> argparse.ArgumentParser:
+    """
+    Creates the parser for the command line filters of the export.
+    :return: The argument parser.
+    """
+    parser = argparse.ArgumentParser(description='Export Trello cards to a spreadsheet and email it. '
+                                                 'Filtered exports only write the spreadsheet.')
+    parser.add_argument('--since', type=parse_date_arg, default=None,
+                        help='Only export cards last active on or after this date (YYYY-MM-DD). '
+                             'Defaults to today with --include-closed and no --until.')
+    parser.add_argument('--until', type=parse_date_arg, default=None,
+                        help='Only export cards last active on or before this date (YYYY-MM-DD).')
+    parser.add_argument('--lists', nargs='+', default=[],
+                        help='Only export cards in these Trello lists.')
+    parser.add_argument('--labels', nargs='+', default=[],
+                        help='Only export cards with at least one of these labels.')
+    parser.add_argument('--include-closed', action='store_true',
+                        help='Also export archived cards.')
+
+    return parser
+
+
+def parse_date_arg(date_str: str) -> datetime.date:
+    """
+    Converts a YYYY-MM-DD command line value into a date.
+    :param date_str: The date given on the command line.
+    :return: The date.
+    """
+    try:
+        return datetime.datetime.strptime(date_str, DATE_ARG_FORMAT).date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Not a valid date (YYYY-MM-DD): {date_str}')
+
+
+def check_export_args(parser: argparse.ArgumentParser, args: argparse.Namespace, all_lists: dict) -> None:
+    """
+    Checks the command line filters against each other and the board, exiting with an error if they don't fit.
+    :param parser: The argument parser, used to report errors.
+    :param args: The parsed command line filters.
+    :param all_lists: A dictionary of all the list ID's and names, archived lists included.
+    """
+    if args.since is not None and args.until is not None and args.since > args.until:
+        parser.error(f'--since {args.since} is after --until {args.until}')
+
+    list_names_index = get_list_names_index(all_lists)
+    for list_name in args.lists:
+        if list_name.upper() not in list_names_index:
+            parser.error(f'No Trello list named: {list_name}')
+
+
+def has_export_filters(args: argparse.Namespace) -> bool:
     """
-    Calls the Trello API and gets all the active cards on the board.
+    Checks if any command line filter was given.
+    :param args: The parsed command line filters.
+    :return: True if the export is filtered.
+    """
+    return (args.since is not None or args.until is not None or bool(args.lists)
+            or bool(args.labels) or args.include_closed)
+
+
+def get_card_query(card_filter: str) -> str:
+    """
+    Creates the query string that limits which cards the Trello API returns.
+    :param card_filter: The Trello card filter, open, visible or all.
+    :return: The query string, starting with the auth values.
+    """
+    return f'{AUTH}&filter={card_filter}'
+
+
+def get_all_cards(card_query: str = AUTH) -> list:
+    """
+    Calls the Trello API and gets all the cards on the board.
+    :param card_query: The query string used to filter the cards. Defaults to all the active cards.
     :return: A list of all the card dictionaries.
     """
-    api_result = requests.get(ALL_CARD_URL).content
+    api_result = requests.get(f'{ALL_CARD_URL}'
+                              f'{card_query}').content
+    cards_json = json.loads(api_result)
+
+    return cards_json
+
+
+def get_list_cards(list_id: str, card_query: str = AUTH) -> list:
+    """
+    Calls the Trello API and gets the cards in a single Trello list.
+    :param list_id: The ID of the Trello list.
+    :param card_query: The query string used to filter the cards. Defaults to all the active cards.
+    :return: A list of the card dictionaries.
+    """
+    api_result = requests.get(f'{LIST_URL}'
+                              f'{list_id}'
+                              f'/cards'
+                              f'{card_query}').content
     cards_json = json.loads(api_result)
 
     return cards_json
 
 
+def get_filtered_cards(args: argparse.Namespace, all_lists: dict) -> list:
+    """
+    Gets the cards that match the export filters. The card state and lists are sent to the Trello API,
+    the dates and labels are checked on the cards that are returned.
+    :param args: The parsed command line filters.
+    :param all_lists: A dictionary of all the list ID's and names, archived lists included.
+    :return: A list of the matching card dictionaries.
+    """
+    since = args.since
+    # Archived cards are usually wanted for the cards completed today, not the whole archive
+    if args.include_closed and args.since is None and args.until is None:
+        since = datetime.date.today()
+
+    # Cards in an archived COMPLETE list are still open, so only the all filter finds them. Trello has no
+    # filter on the last activity, so the whole archive is downloaded and narrowed by the dates below.
+    if args.lists:
+        card_query = get_card_query(CARD_FILTER_ALL if args.include_closed else CARD_FILTER_OPEN)
+        cards = []
+        for list_id in get_list_ids_by_name(args.lists, all_lists):
+            cards += get_list_cards(list_id, card_query)
+    else:
+        # Visible matches the board's default, open cards in open lists
+        cards = get_all_cards(get_card_query(CARD_FILTER_ALL if args.include_closed else CARD_FILTER_VISIBLE))
+
+    label_names = {label.upper() for label in args.labels}
+
+    filtered_cards = []
+    for card in cards:
+        last_activity = get_card_last_activity_date(card)
+
+        if since is not None and last_activity < since:
+            continue
+        if args.until is not None and last_activity > args.until:
+            continue
+        if label_names and not label_names.intersection(label[JS_NAME].upper() for label in card[JS_LABELS]):
+            continue
+
+        filtered_cards.append(card)
+
+    return filtered_cards
+
+
+def get_list_names_index(all_lists: dict) -> dict:
+    """
+    Groups the list ID's by their upper case name, as more than one list can share a name.
+    :param all_lists: A dictionary of list ID's and names.
+    :return: A dictionary of upper case list names and lists of their ID's.
+    """
+    list_names_index = {}
+    for list_id, list_name in all_lists.items():
+        list_names_index.setdefault(list_name.upper(), []).append(list_id)
+
+    return list_names_index
+
+
+def get_list_ids_by_name(list_names: list, all_lists: dict) -> list:
+    """
+    Finds the ID's of the Trello lists with the given names. Names are not case sensitive.
+    :param list_names: The names of the Trello lists.
+    :param all_lists: A dictionary of list ID's and names.
+    :return: A list of the matching list ID's, each ID only once.
+    """
+    list_names_index = get_list_names_index(all_lists)
+
+    # A dictionary keeps the order the lists were given in while dropping repeated ID's
+    list_ids = {}
+    for list_name in list_names:
+        for list_id in list_names_index.get(list_name.upper(), []):
+            list_ids[list_id] = None
+
+    return list(list_ids)
+
+
 def get_all_members() -> dict:
     """
     Gets all of the members on the Trello board.
@@ -156,12 +328,13 @@ def format_time_utc_to_local(time_str: str) -> datetime:
     return datetime_obj_pacific
 
 
-def get_all_trello_lists() -> dict:
+def get_all_trello_lists(list_filter: str = CARD_FILTER_OPEN) -> dict:
     """
     Calls the Trello API and gets all the list ID's and names.
+    :param list_filter: The Trello list filter, open or all. Defaults to the open lists.
     :return: A dictionary of dictionary keys and values of all the custom fields.
     """
-    api_result = requests.get(LISTS_URL).content
+    api_result = requests.get(f'{LISTS_URL}&filter={list_filter}').content
     t_lists_json = json.loads(api_result)
 
     list_dict = {}
@@ -284,12 +457,14 @@ def get_trello_card_actions_json(card_id: str) -> list:
     return card_actions
 
 
-def create_spreadsheet_nested_list() -> list:
+def create_spreadsheet_nested_list(args: argparse.Namespace, all_lists: dict) -> list:
     """
     Creates the nested list of all the values to be used in the spreadsheet.
+    :param args: The parsed command line filters.
+    :param all_lists: A dictionary of all the list ID's and names, archived lists included.
     :return: A nested list.
     """
-    all_cards_list = get_all_cards()
+    all_cards_list = get_filtered_cards(args, all_lists)
     all_custom_field_names = get_custom_field_names()
 
     spreadsheet_row_list = [SPREADSHEET_ROW_1]
@@ -301,26 +476,27 @@ def create_spreadsheet_nested_list() -> list:
         card_actions_json = get_trello_card_actions_json(card[JS_ID])
         # Put a new list of data into the main list
         spreadsheet_row_list += [create_spreadsheet_row(card, custom_field_values_dict,
-                                                        all_custom_field_names, card_actions_json)]
+                                                        all_custom_field_names, card_actions_json, all_lists)]
         print(f'Getting info for: {card[JS_NAME]}')
 
     return spreadsheet_row_list
 
 
 def create_spreadsheet_row(card: dict, custom_field_values_dict: dict,
-                           all_custom_field_names: list, card_actions: list) -> list:
+                           all_custom_field_names: list, card_actions: list, all_lists: dict) -> list:
     """
     Creates a list containing all the info for a row of the spreadsheet.
     :param card: Trello card JSON info.
     :param custom_field_values_dict: A dictionary of all the custom field values of the card.
     :param all_custom_field_names: A dictionary of all the custom field names of the card.
     :param card_actions: A list of all the actions on the card.
+    :param all_lists: A dictionary of all the list ID's and names, archived lists included.
     :return: A list of all the info for the row of the spreadsheet.
     """
     row = [get_card_last_activity(card).upper(),
            get_card_label(card).upper(),
            get_card_name(card).upper(),
-           get_card_current_list(card).upper(),
+           get_card_current_list(card, all_lists).upper(),
            get_card_members(card).upper(),
            get_backlog_start_date(card_actions).upper(),
            get_date_approved(card_actions).upper(),
@@ -487,6 +663,15 @@ def get_card_last_activity(card: dict) -> str:
     return format_time_utc_to_local(card[JS_LAST_ACTIVITY]).strftime(DATE_TIME_FORMAT_LOCAL)
 
 
+def get_card_last_activity_date(card: dict) -> datetime.date:
+    """
+    Gets the pacific time date of the card's last activity.
+    :param card: Trello card JSON info.
+    :return: The date of the last activity.
+    """
+    return format_time_utc_to_local(card[JS_LAST_ACTIVITY]).astimezone(timezone(TIMEZONE)).date()
+
+
 def get_card_label(card: dict) -> str:
     """
     Gets all labels on the card.
@@ -506,14 +691,14 @@ def get_card_name(card: dict) -> str:
     return card[JS_NAME]
 
 
-def get_card_current_list(card: dict) -> str:
+def get_card_current_list(card: dict, all_lists: dict) -> str:
     """
     Gets the current Trello list the card belongs to.
     :param card: Trello card JSON info.
+    :param all_lists: A dictionary of all the list ID's and names, archived lists included.
     :return: The name of the list.
     """
-    lists = get_all_trello_lists()
-    return lists[card[JS_LIST]]
+    return all_lists[card[JS_LIST]]
 
 
 def get_card_members(card: dict) -> str:
@@ -635,15 +820,26 @@ def update_trello_board(date_next_workday: str):
 
 def main() -> None:
 
+    parser = get_export_parser()
+    args = parser.parse_args()
+
+    all_lists = get_all_trello_lists(CARD_FILTER_ALL)
+    check_export_args(parser, args, all_lists)
+
     today_date, next_workday_date = get_date()
 
-    spreadsheet_nested_list = create_spreadsheet_nested_list()
+    spreadsheet_nested_list = create_spreadsheet_nested_list(args, all_lists)
 
     sort_spreadsheet_by_date(spreadsheet_nested_list)
 
     spreadsheet_filepath = create_spreadsheet(spreadsheet_nested_list, today_date.strftime(DATING_FORMAT),
                                               f'{today_date.strftime(DATING_FORMAT)} Trello Log')
 
+    # A filtered export is a one-off report, so it is not emailed and the board is not rolled over
+    if has_export_filters(args):
+        print(f'Filtered export saved to: {spreadsheet_filepath}')
+        return
+
     email_file(spreadsheet_filepath, today_date.strftime(DATING_FORMAT))
 
     update_trello_board(next_workday_date.strftime(DATING_FORMAT))